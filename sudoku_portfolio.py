@@ -0,0 +1,152 @@
+import logging, argparse, multiprocessing, queue, random, time
+
+from sudoku_simple import Sudoku_Solver, Sudoku_Invalid_Puzzle, validate_puzzle
+from sudoku_puzzles import puzzle, variant_puzzle
+from sudoku_variants import Sudoku_Variant, STANDARD_VARIANT
+
+# The search configurations raced against each other by solve_portfolio().
+# Each configuration has
+#   order     - how Sudoku_Solver.choose_cell() picks the cell to try next
+#   seed      - if set, ties between cells and the order of the values are
+#               picked at random, starting from this seed
+#   max_tries - if set, the search is restarted from the starting grid with
+#               a new random order after this many tries, and the limit is
+#               multiplied by 'growth' on every restart
+CONFIGURATIONS = [
+    {'name':"first",    'order':"first"},
+    {'name':"fewest",   'order':"fewest"},
+    {'name':"random-1", 'order':"fewest", 'seed':1, 'max_tries':16, 'growth':1.5},
+    {'name':"random-2", 'order':"first",  'seed':2, 'max_tries':16, 'growth':1.5},
+]
+
+# how often, in seconds, solve_portfolio() checks for workers that have died
+# without posting a result
+POLL_INTERVAL = 0.1
+
+def run_configuration(seed_values, variant=STANDARD_VARIANT, configuration=CONFIGURATIONS[0]):
+    # This function solves the puzzle with a single configuration, and
+    # returns the solution as a 9x9 array of numbers, or None if the puzzle
+    # cannot be solved.
+    if configuration.get('seed') is None:
+        rng = None
+    else:
+        rng = random.Random(configuration['seed'])
+    max_tries = configuration.get('max_tries')
+    restarts = 0
+    while True:
+        solver = Sudoku_Solver(seed_values, variant=variant)
+        result = solver.solve(configuration['order'], rng, max_tries)
+        if result is not None:
+            break
+        # give up on this search order, and start again with a new one
+        restarts += 1
+        max_tries = int(max_tries * configuration.get('growth', 1.5)) + 1
+        logging.debug("%s: restart %d with up to %d tries"%(configuration['name'], restarts, max_tries))
+
+    if result:
+        return solver.get_solution()
+    return None
+
+def _portfolio_worker(results, seed_values, variant, configuration):
+    try:
+        solution = run_configuration(seed_values, variant, configuration)
+    except Exception as e:
+        # let the other configurations carry on
+        results.put((configuration['name'], None, str(e)))
+    else:
+        results.put((configuration['name'], solution, None))
+
+def solve_portfolio(seed_values, variant=STANDARD_VARIANT, configurations=CONFIGURATIONS,
+                    timeout=None):
+    # This function races the configurations against each other, each in its
+    # own process. As soon as one of them finishes, the others are stopped.
+    # It returns (solution, name of the configuration that finished first),
+    # where the solution is None if the puzzle cannot be solved. It raises
+    # Sudoku_Invalid_Puzzle if the starting grid is invalid, TimeoutError if
+    # no configuration finished within 'timeout' seconds, and RuntimeError if
+    # every configuration failed or its process died.
+    validate_puzzle(seed_values, variant)
+
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_portfolio_worker,
+                                         args=(results, seed_values, variant, configuration),
+                                         daemon=True)
+                 for configuration in configurations]
+    for process in processes:
+        process.start()
+    if timeout is not None:
+        deadline = time.monotonic() + timeout
+    # the processes that have not posted a result yet
+    pending = dict((configuration['name'], process)
+                   for (configuration, process) in zip(configurations, processes))
+    try:
+        while pending:
+            # a worker that had already exited before we waited, but whose
+            # result did not turn up, died without posting one
+            exited = [name for (name, process) in pending.items() if not process.is_alive()]
+            wait = POLL_INTERVAL
+            if timeout is not None:
+                wait = min(wait, max(deadline - time.monotonic(), 0))
+            try:
+                (name, solution, error) = results.get(timeout=wait)
+            except queue.Empty:
+                for name in exited:
+                    logging.error("%s: exited with code %s without a result"%
+                                  (name, pending.pop(name).exitcode))
+                if timeout is not None and time.monotonic() >= deadline:
+                    raise TimeoutError("No solution found within %s seconds"%timeout)
+                continue
+            pending.pop(name, None)
+            if error is None:
+                return (solution, name)
+            logging.error("%s: %s"%(name, error))
+        raise RuntimeError("Every configuration failed")
+    finally:
+        # cancel the configurations that are still searching
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+
+def parseOptions():
+    parser = argparse.ArgumentParser(description="Solves a Sudoku puzzle without opening a "
+                                     "window, by racing several search orders against each "
+                                     "other in separate processes")
+
+    parser.add_argument("-p", "--puzzle_level",
+        help="Selects the difficulty level of the puzzle",
+        choices=list(puzzle.keys()) + list(variant_puzzle.keys()),
+        action="store", required=False, default="empty")
+
+    parser.add_argument("-t", "--timeout", metavar="SECONDS",
+        help="Gives up if no search order has finished within SECONDS",
+        type=float, action="store", required=False, default=None)
+
+    args = parser.parse_args()
+
+    return args
+
+if __name__ == "__main__":
+    args = parseOptions()
+
+    # work out the seed values, and the constraints if the puzzle is one of
+    # the Sudoku variants
+    if args.puzzle_level in variant_puzzle:
+        seed_values = variant_puzzle[args.puzzle_level]['grid']
+        variant = Sudoku_Variant(**variant_puzzle[args.puzzle_level]['variant'])
+    else:
+        seed_values = puzzle[args.puzzle_level]
+        variant = STANDARD_VARIANT
+
+    try:
+        (solution, name) = solve_portfolio(seed_values, variant, timeout=args.timeout)
+    except (Sudoku_Invalid_Puzzle, TimeoutError, RuntimeError) as e:
+        logging.error(str(e))
+    else:
+        if solution is None:
+            logging.info("Puzzle cannot be solved (%s)"%name)
+        else:
+            logging.info("Puzzle solved! (%s)"%name)
+            for row in solution:
+                logging.info(" ".join(str(value) for value in row))
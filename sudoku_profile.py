@@ -0,0 +1,214 @@
+import time, cProfile, pstats, io, functools, heapq
+from contextlib import contextmanager
+
+# The profiler that is currently collecting timings. This is None unless
+# profiling has been switched on, so the solver only pays for a single check
+# per call when profiling is off.
+active_profiler = None
+
+# the number of puzzles whose timings are reported in full. The timings of the
+# other puzzles are only added to the batch total.
+SLOWEST_PUZZLES = 10
+
+# This class collects the time spent in each phase of the solver. Phases can
+# be nested (e.g. update_cells inside update_grid), and the timings are kept
+# per puzzle, so that a slow puzzle can be picked out of a batch. Only the
+# 'slowest' puzzles are kept in full, so a large batch does not fill up memory.
+# If a 'puzzle' name is given, cProfile only runs while that puzzle is being
+# solved, and dump_collapsed() only writes out the stacks of that puzzle.
+class Profiler(object):
+    def __init__(self, use_cprofile=False, slowest=SLOWEST_PUZZLES, puzzle=None):
+        self.slowest = slowest
+        self.puzzle = puzzle
+        self.puzzle_stacks = {}
+        self.puzzle_count = 0
+        # the timings of the puzzle being solved, as [seconds, puzzle number,
+        # puzzle name, {phase: [calls, seconds]}, {stack: self seconds}], where
+        # a stack is "phase;phase" and the seconds are those of the top level
+        # phases
+        self.current = None
+        # a heap of the finished puzzles in the same form, with the fastest
+        # of them on top
+        self.slowest_puzzles = []
+        # the phase timings and the collapsed stacks of all the puzzles
+        # together, and of the puzzles that are no longer kept in full
+        self.batch = {}
+        self.batch_seconds = 0.0
+        self.other_stacks = {}
+        self.phase_stack = []
+        if use_cprofile:
+            self.cprofile = cProfile.Profile()
+        else:
+            self.cprofile = None
+
+    def start_puzzle(self, name):
+        # all phases recorded after this call are counted against this puzzle
+        self.finish_puzzle()
+        self.puzzle_count += 1
+        self.current = [0.0, self.puzzle_count, name, {}, {}]
+        if self.cprofile and name == self.puzzle:
+            self.cprofile.enable()
+
+    def finish_puzzle(self):
+        # keep the puzzle that has just been solved if it is one of the
+        # slowest, and drop the details of the fastest one otherwise
+        if self.current is None:
+            return
+        if self.current[2] == self.puzzle:
+            if self.cprofile:
+                self.cprofile.disable()
+            self._add_stacks(self.puzzle_stacks, self.current[4])
+        heapq.heappush(self.slowest_puzzles, tuple(self.current))
+        self.current = None
+        if len(self.slowest_puzzles) > self.slowest:
+            self._add_stacks(self.other_stacks, heapq.heappop(self.slowest_puzzles)[4])
+
+    def _add_stacks(self, totals, stacks):
+        for stack, seconds in stacks.items():
+            totals[stack] = totals.get(stack, 0.0) + seconds
+
+    def enable(self):
+        if self.cprofile and self.puzzle is None:
+            self.cprofile.enable()
+
+    def disable(self):
+        if self.cprofile:
+            self.cprofile.disable()
+
+    @contextmanager
+    def phase(self, name):
+        if self.current is None:
+            self.start_puzzle("puzzle")
+        puzzle = self.current
+        # each entry on the stack holds the phase name and the time spent in
+        # its child phases, so that we can work out the self time later
+        self.phase_stack.append([name, 0.0])
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            child_time = self.phase_stack[-1][1]
+            stack = ";".join(entry[0] for entry in self.phase_stack)
+            self.phase_stack.pop()
+            if self.phase_stack:
+                self.phase_stack[-1][1] += elapsed
+            else:
+                puzzle[0] += elapsed
+                self.batch_seconds += elapsed
+
+            for phases in (puzzle[3], self.batch):
+                totals = phases.setdefault(name, [0, 0.0])
+                totals[0] += 1
+                totals[1] += elapsed
+            puzzle[4][stack] = puzzle[4].get(stack, 0.0) + elapsed - child_time
+
+    def get_batch(self):
+        # returns the phase timings of every puzzle added up
+        return self.batch
+
+    def get_slowest(self):
+        # returns the puzzles that are kept in full, slowest first, as
+        # (seconds, puzzle number, puzzle name, phases, stacks)
+        return sorted(self.slowest_puzzles, reverse=True)
+
+    def report(self):
+        lines = []
+        slowest = self.get_slowest()
+        if len(slowest) < self.puzzle_count:
+            lines.append("The %d slowest of %d puzzles:"%(len(slowest), self.puzzle_count))
+        for seconds, number, puzzle_name, phases, stacks in slowest:
+            lines.append("%s: %.3f ms"%(puzzle_name, seconds*1000))
+            lines += self._report_phases(phases)
+        lines.append("batch total (%d puzzles): %.3f ms"%(self.puzzle_count, self.batch_seconds*1000))
+        lines += self._report_phases(self.batch)
+        return "\n".join(lines)
+
+    def _report_phases(self, phases):
+        return ["    %-14s %8d calls %10.3f ms"%(name, calls, seconds*1000)
+                for name, (calls, seconds) in sorted(phases.items(), key=lambda item: -item[1][1])]
+
+    def dump_collapsed(self, filename):
+        # write one "stack count" line per stack, with the self time given in
+        # microseconds. The slowest puzzles get a stack of their own, and the
+        # others are added up under "other puzzles"
+        if self.puzzle is not None:
+            self._write_stacks(filename, dict((self.puzzle + ";" + stack, stack_seconds)
+                                              for stack, stack_seconds in self.puzzle_stacks.items()))
+            return
+        stacks = {}
+        for seconds, number, puzzle_name, phases, puzzle_stacks in self.get_slowest():
+            self._add_stacks(stacks, dict((puzzle_name + ";" + stack, stack_seconds)
+                                          for stack, stack_seconds in puzzle_stacks.items()))
+        self._add_stacks(stacks, dict(("other puzzles;" + stack, stack_seconds)
+                                      for stack, stack_seconds in self.other_stacks.items()))
+        self._write_stacks(filename, stacks)
+
+    def _write_stacks(self, filename, stacks):
+        with open(filename, "w") as f:
+            for stack, seconds in sorted(stacks.items()):
+                f.write("%s %d\n"%(stack, round(seconds*1000000)))
+
+    def dump_stats(self, filename):
+        if self.cprofile:
+            self.cprofile.dump_stats(filename)
+
+    def get_stats(self, sort_by="cumulative", limit=20):
+        # returns the cProfile statistics as a printable string
+        if not self.cprofile:
+            return ""
+        stream = io.StringIO()
+        pstats.Stats(self.cprofile, stream=stream).sort_stats(sort_by).print_stats(limit)
+        return stream.getvalue()
+
+@contextmanager
+def profiling(puzzle_name=None, use_cprofile=False, profiler=None):
+    # Switches profiling on for the duration of the 'with' block, e.g.
+    #
+    #   with sudoku_profile.profiling("expert3") as profiler:
+    #       ... solve the puzzle ...
+    #   print(profiler.report())
+    #
+    # An existing profiler can be passed in to add another puzzle to a batch.
+    # The last puzzle is only counted once the 'with' block has finished.
+    global active_profiler
+    if profiler is None:
+        profiler = Profiler(use_cprofile)
+    if puzzle_name is not None:
+        profiler.start_puzzle(puzzle_name)
+    previous_profiler = active_profiler
+    active_profiler = profiler
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.finish_puzzle()
+        profiler.disable()
+        active_profiler = previous_profiler
+
+def start_puzzle(name):
+    # starts counting phases against a new puzzle, if profiling is switched on
+    if active_profiler is not None:
+        active_profiler.start_puzzle(name)
+
+@contextmanager
+def phase(name):
+    # times a block of code as the given phase, if profiling is switched on
+    if active_profiler is None:
+        yield
+    else:
+        with active_profiler.phase(name):
+            yield
+
+def timed(name):
+    # a decorator that times every call to the function as the given phase,
+    # if profiling is switched on
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if active_profiler is None:
+                return function(*args, **kwargs)
+            with active_profiler.phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -180,4 +180,130 @@ puzzle =    {
         [0,0,0,0,0,0,0,0,0],
         [0,0,0,0,0,0,0,0,0] 
     ]
-}
\ No newline at end of file
+}
+
+# Example Sudoku variant puzzles. Each has a starting 'grid', and the
+# 'variant' constraints that are passed on to sudoku_variants.Sudoku_Variant
+variant_puzzle = {
+    "diagonal":
+    {
+        "grid":
+        [ 
+            [0,0,4,0,0,0,0,7,9],
+            [0,0,0,0,0,8,2,0,0],
+            [9,0,0,0,0,0,0,0,0],
+            [6,0,0,0,0,0,0,1,0],
+            [0,0,0,1,0,0,0,0,8],
+            [0,0,0,0,7,0,0,0,0],
+            [0,0,0,6,0,3,9,0,0],
+            [1,0,0,0,0,0,0,0,0],
+            [5,0,0,0,0,7,0,0,0] 
+        ],
+        "variant":
+        {
+            "diagonals": True
+        }
+    },
+    "windoku":
+    {
+        "grid":
+        [ 
+            [0,5,0,3,0,0,0,0,0],
+            [0,7,0,0,0,0,0,2,4],
+            [9,0,6,2,0,0,0,0,0],
+            [0,0,0,0,0,0,0,0,0],
+            [0,0,0,0,0,0,0,0,7],
+            [0,0,0,0,0,0,0,4,0],
+            [0,1,0,0,0,8,7,0,0],
+            [0,4,0,0,0,0,0,0,0],
+            [0,0,0,6,0,9,0,0,0] 
+        ],
+        "variant":
+        {
+            "windows": True
+        }
+    },
+    "jigsaw":
+    {
+        "grid":
+        [ 
+            [0,6,0,0,0,0,0,0,0],
+            [0,0,0,0,0,0,0,9,0],
+            [1,2,9,0,0,0,0,0,0],
+            [0,7,0,0,4,0,6,0,0],
+            [0,0,0,0,0,1,0,0,0],
+            [0,0,3,6,7,0,0,0,5],
+            [6,0,0,2,0,0,0,0,0],
+            [0,0,0,0,0,0,9,0,0],
+            [0,5,0,0,0,0,1,2,7] 
+        ],
+        "variant":
+        {
+            "regions":
+            [ 
+                [0,0,0,1,1,1,1,2,2],
+                [0,0,1,1,1,2,2,2,2],
+                [3,0,0,0,1,1,2,2,2],
+                [3,3,0,4,4,4,5,5,5],
+                [3,3,3,4,4,4,5,5,5],
+                [3,3,3,4,4,4,8,5,5],
+                [6,6,6,6,6,7,8,8,5],
+                [6,6,7,7,7,7,8,8,8],
+                [6,6,7,7,7,7,8,8,8] 
+            ]
+        }
+    },
+    "killer":
+    {
+        "grid":
+        [ 
+            [0,0,0,0,0,0,0,0,0],
+            [0,0,0,0,0,0,0,0,0],
+            [0,0,0,0,0,0,0,0,0],
+            [0,0,0,0,0,0,0,0,0],
+            [0,0,0,0,0,0,0,0,0],
+            [0,0,0,0,0,0,0,0,0],
+            [0,0,0,0,0,0,0,0,0],
+            [0,0,0,0,0,0,0,0,0],
+            [0,0,0,0,0,0,0,0,0] 
+        ],
+        "variant":
+        {
+            "cages":
+            [
+                (13, [(0,0), (1,0), (2,0)]),
+                (12, [(0,1), (1,1), (1,2)]),
+                (17, [(0,2), (0,3)]),
+                (9, [(0,4), (0,5), (1,5)]),
+                (19, [(0,6), (1,6), (1,7)]),
+                (8, [(0,7), (0,8)]),
+                (6, [(1,3), (2,3)]),
+                (22, [(1,4), (2,4), (2,5)]),
+                (13, [(1,8), (2,8)]),
+                (11, [(2,1), (2,2)]),
+                (5, [(2,6), (3,6)]),
+                (6, [(2,7), (3,7)]),
+                (17, [(3,0), (4,0)]),
+                (14, [(3,1), (4,1), (3,2), (5,1)]),
+                (8, [(3,3), (3,4)]),
+                (11, [(3,5), (4,5)]),
+                (15, [(3,8), (4,8), (4,7)]),
+                (16, [(4,2), (5,2), (6,2)]),
+                (17, [(4,3), (4,4), (5,3), (5,4)]),
+                (25, [(4,6), (5,6), (5,5), (6,6)]),
+                (11, [(5,0), (6,0)]),
+                (14, [(5,7), (6,7), (6,8)]),
+                (6, [(5,8)]),
+                (18, [(6,1), (7,1), (7,0)]),
+                (16, [(6,3), (6,4), (7,4)]),
+                (6, [(6,5), (7,5)]),
+                (10, [(7,2), (8,2), (7,3)]),
+                (8, [(7,6), (8,6)]),
+                (17, [(7,7), (8,7)]),
+                (8, [(7,8), (8,8)]),
+                (7, [(8,0), (8,1)]),
+                (20, [(8,3), (8,4), (8,5)])
+            ]
+        }
+    }
+}
@@ -1,9 +1,18 @@
-import logging, argparse, copy, json
+import logging, argparse, copy, json, contextlib, itertools, sys, time
 import tkinter as tk
 from tkinter import font as tkFont
 
-# import in a sample of Sudoku puzzles of various difficulty levels
-from sudoku_puzzles import puzzle
+# import in a sample of Sudoku puzzles of various difficulty levels, and of
+# Sudoku variants
+from sudoku_puzzles import puzzle, variant_puzzle
+
+# the constraints (units and killer cages) of standard and variant puzzles
+from sudoku_variants import Sudoku_Variant, STANDARD_VARIANT
+
+# timing hooks for the solver phases, these do nothing unless profiling is
+# switched on
+import sudoku_profile
+from sudoku_profile import timed
 
 # set up basic logging, if you want to see each cell value being printed out,
 # you can set the level to logging.DEBUG
@@ -19,6 +28,13 @@ GO_BTN_ROW      = 7
 
 CELL_FILLED_COLOUR = "#34abeb"
 
+# puzzles that need at most this many tries to solve are rated "hard", and
+# any that need more are rated "expert"
+DIFFICULTY_HARD_TRIES = 10
+
+# the number of puzzles read from a --batch file at a time
+BATCH_CHUNK_SIZE = 1000
+
 GRID_DIMENSION  = 60
 CTRL_COLUMNSPAN = 2
 NUM_COLUMNS     = (9+CTRL_COLUMNSPAN)
@@ -27,6 +43,96 @@ PAD_WIDTH       = 3
 WINDOW_WIDTH    = (GRID_DIMENSION * NUM_COLUMNS + (PAD_WIDTH*2))
 WINDOW_HEIGHT   = (GRID_DIMENSION * NUM_ROWS  + (PAD_WIDTH*2))
 
+# background colours used to pick out the extra units and killer cages of a
+# Sudoku variant
+EXTRA_UNIT_COLOUR = "#e6e0f8"
+CAGE_COLOURS = ["#fdf5d8", "#dff3e3", "#fde3e3", "#dde9f8"]
+
+# This exception is raised when the grid has reached a state that cannot lead
+# to a solution, e.g. two cells in the same row holding the same value. The
+# coordinates of the cells involved are kept in 'cells'.
+class Sudoku_Contradiction(Exception):
+    def __init__(self, message, cells=[]):
+        super().__init__(message)
+        self.cells = list(cells)
+
+# This exception is raised by validate_puzzle() when the starting grid of a
+# puzzle cannot be solved
+class Sudoku_Invalid_Puzzle(Sudoku_Contradiction):
+    pass
+
+def validate_puzzle(seed_values, variant=STANDARD_VARIANT):
+    # This function checks the starting grid of a puzzle before we try to
+    # solve it. It takes either a 9x9 array of numbers (0 for an unfilled
+    # cell), or the output from Sudoku_Solver.get_state(). It raises
+    # Sudoku_Invalid_Puzzle if a value appears twice in a unit or cage, if an
+    # unfilled cell has no possible values left, if a value cannot be placed
+    # anywhere in a unit, or if a killer cage cannot add up to its total.
+    if len(seed_values) != 9 or any(len(seed_row) != 9 for seed_row in seed_values):
+        raise Sudoku_Invalid_Puzzle("Puzzle is not a 9x9 grid")
+
+    # work out the possible values of each cell, with a list of one value for
+    # a filled cell
+    possible_values = []
+    for row, seed_row in enumerate(seed_values):
+        row_values = []
+        for column, seed_value in enumerate(seed_row):
+            if isinstance(seed_value, list):
+                values = [value for value in seed_value if value != 0]
+            elif seed_value:
+                values = [seed_value]
+            else:
+                values = [1,2,3,4,5,6,7,8,9]
+            for value in values:
+                if value < 1 or value > 9:
+                    raise Sudoku_Invalid_Puzzle("Invalid cell (%d,%d) value: %d"%(row,column,value), [(row,column)])
+            if not values:
+                values = [1,2,3,4,5,6,7,8,9]
+            row_values.append(values)
+        possible_values.append(row_values)
+
+    # look for filled values that appear more than once in a unit or cage
+    for unit in variant.units + [cells for (total, cells) in variant.cages]:
+        filled = {}
+        for (row, column) in unit:
+            values = possible_values[row][column]
+            if len(values) == 1:
+                if values[0] in filled:
+                    raise Sudoku_Invalid_Puzzle("Invalid cell (%d,%d) value: %d"%(row,column,values[0]),
+                                                [filled[values[0]], (row,column)])
+                filled[values[0]] = (row, column)
+
+    # remove the filled values from the possible values of their peers, and
+    # check that every unfilled cell has a value left
+    for row in range(9):
+        for column in range(9):
+            values = possible_values[row][column]
+            if len(values) > 1:
+                taken = set(possible_values[peer_row][peer_column][0]
+                            for (peer_row, peer_column) in variant.peers[row][column]
+                            if len(possible_values[peer_row][peer_column]) == 1)
+                values = [value for value in values if value not in taken]
+                if not values:
+                    raise Sudoku_Invalid_Puzzle("Cell (%d,%d) has no possible values"%(row,column), [(row,column)])
+                possible_values[row][column] = values
+
+    # check that the filled cells of each cage do not already add up to more
+    # than its total
+    for (total, cells) in variant.cages:
+        filled = [possible_values[row][column][0] for (row, column) in cells
+                  if len(possible_values[row][column]) == 1]
+        if sum(filled) > total or (len(filled) == len(cells) and sum(filled) != total):
+            raise Sudoku_Invalid_Puzzle("Cage %s cannot add up to %d"%(cells, total), cells)
+
+    # finally, check that every value can still be placed in every unit
+    for unit in variant.units:
+        unit_values = set()
+        for (row, column) in unit:
+            unit_values.update(possible_values[row][column])
+        if len(unit_values) != 9:
+            missing = min(set(range(1,10)) - unit_values)
+            raise Sudoku_Invalid_Puzzle("Value %d cannot be placed in cells %s"%(missing, unit), unit)
+
 # This class displays a tooltip showing the possible values of a cell as the
 # mouse hovers over the cell grid
 class ToolTip(object):
@@ -65,48 +171,17 @@ class ToolTip(object):
         if tw:
             tw.destroy()
 
-# This class defines a single cell on a Sudoku grid
-class Sudoku_Cell(tk.Entry):
+# This class holds the possible values of a single cell on a Sudoku grid. It
+# has no widget, so that a Sudoku_Solver can work through a puzzle without a
+# display. Sudoku_Cell adds the widget on top of it.
+class Sudoku_Cell_State(object):
+    # background colour used while the cell is unfilled
+    original_bg = None
+
     def __init__(self, master=None, value=0):
-        super().__init__(master)
         self.master = master
-        # save the default background colour for use later
-        self.original_bg = self.cget("bg")
-        self.cell_string = tk.StringVar()
-        # set the font for the number grid
-        self.config(font=grid_font, textvariable=self.cell_string, justify="center", 
-                    disabledbackground="#d3d3d3", disabledforeground="blue")
-        # set the state of the cell
         self.set_state(value, 'disabled')
-        # bind key-up and focus-in events
-        self.bind("<KeyRelease>", self.entry_change) #keyup
-        self.bind('<FocusIn>', self.on_focus)
-        # create a tooltip that shows the possible values of the cell
-        self.tooltip = ToolTip(self)
-        self.bind('<Enter>', self.enter_cb)
-        self.bind('<Leave>', self.leave_cb)
-
-    def enter_cb(self, event):
-        self.tooltip.showtip(str(self.possible_values))
-
-    def leave_cb(self, event):
-        self.tooltip.hidetip()
-
-    def entry_change(self, event):
-        try:
-            value = int(self.cell_string.get()[0])
-        except (ValueError, IndexError):
-            self.__reset_cell()
-        else:
-            if value > 0 and value < 10:
-                self.set_state(value)
-        finally:
-            self.master.focus()
 
-    def on_focus(self, event):
-        # when the cell is focused on, set the cursor position the start
-        self.icursor(0)
-        
     def remove_possible_value(self,value):
         if len(self.possible_values) == 1:
             # we have already arrived at an answer previously, do nothing
@@ -150,10 +225,10 @@ class Sudoku_Cell(tk.Entry):
                         if this_value == 0 and len(value) == 1:
                             # we assume a single zero value means an empty cell
                             return
-                        raise AttributeError("Trying to set invalid state: %d in %s"%(this_value, str(value)))
+                        raise ValueError("Trying to set invalid state: %d in %s"%(this_value, str(value)))
                 self.possible_values = value
             else:
-                raise AttributeError("Trying to set invalid state: %s"%str(value))
+                raise ValueError("Trying to set invalid state: %s"%str(value))
         else:
             # value is not a list, check that the single value is valid
             if value > 0 and value < 10:
@@ -162,21 +237,29 @@ class Sudoku_Cell(tk.Entry):
         self.__check_value_set(state)
 
     def set_error(self):
-        self.config(bg="red")
+        self.cell_bg = "red"
+        self.needs_redraw = True
+
+    def redraw(self):
+        # there is no widget to redraw
+        self.needs_redraw = False
+        return False
 
     def __check_value_set(self, state="normal"):
         if len(self.possible_values) == 1:
             # cell value has been determined, flag that we need to update
             # other cells
-            self.cell_string.set(str(self.possible_values[0]))
-            self.config(bg=CELL_FILLED_COLOUR, state=state)
+            self.cell_bg = CELL_FILLED_COLOUR
+            self.cell_state = state
+            self.needs_redraw = True
             self.cells_need_updating = True
 
     def __reset_cell(self):
-        self.cell_string.set("")
         self.possible_values = [1,2,3,4,5,6,7,8,9]
         self.cells_need_updating = False
-        self.config(bg=self.original_bg, state="normal")
+        self.cell_bg = self.original_bg
+        self.cell_state = "normal"
+        self.needs_redraw = True
 
     def __repr__(self):
         if len(self.possible_values) == 1:
@@ -190,46 +273,155 @@ class Sudoku_Cell(tk.Entry):
         else:
             return "X (Possible values: %s)"%(self.possible_values) 
 
+# This class defines a single cell on a Sudoku grid
+class Sudoku_Cell(Sudoku_Cell_State, tk.Entry):
+    def __init__(self, master=None, value=0):
+        tk.Entry.__init__(self, master)
+        self.master = master
+        # save the default background colour for use later
+        self.original_bg = self.cget("bg")
+        self.cell_string = tk.StringVar()
+        # set the font for the number grid
+        self.config(font=grid_font, textvariable=self.cell_string, justify="center", 
+                    disabledbackground="#d3d3d3", disabledforeground="blue")
+        # the total of the killer cage that holds this cell, if any
+        self.cage_total = None
+        # keep track of what the widget is currently showing, so that redraw()
+        # only touches the widget when the displayed text or colour changes
+        self.displayed = {'text':"", 'bg':self.original_bg, 'state':"normal"}
+        # set the state of the cell, and show it straight away
+        self.set_state(value, 'disabled')
+        self.redraw()
+        # bind key-up and focus-in events
+        self.bind("<KeyRelease>", self.entry_change) #keyup
+        self.bind('<FocusIn>', self.on_focus)
+        # create a tooltip that shows the possible values of the cell
+        self.tooltip = ToolTip(self)
+        self.bind('<Enter>', self.enter_cb)
+        self.bind('<Leave>', self.leave_cb)
+
+    def enter_cb(self, event):
+        if self.cage_total is None:
+            self.tooltip.showtip(str(self.possible_values))
+        else:
+            self.tooltip.showtip("%s\ncage total: %d"%(self.possible_values, self.cage_total))
+
+    def leave_cb(self, event):
+        self.tooltip.hidetip()
+
+    def entry_change(self, event):
+        # the user has typed straight into the widget, so we no longer know
+        # what text it is showing
+        self.displayed['text'] = None
+        try:
+            value = int(self.cell_string.get()[0])
+        except (ValueError, IndexError):
+            # reset the cell to empty
+            self.set_state(0)
+        else:
+            if value > 0 and value < 10:
+                self.set_state(value)
+        finally:
+            self.redraw()
+            self.master.focus()
+
+    def on_focus(self, event):
+        # when the cell is focused on, set the cursor position the start
+        self.icursor(0)
+
+    def set_background(self, colour):
+        # changes the background colour used while the cell is unfilled
+        if self.cell_bg == self.original_bg:
+            self.cell_bg = colour
+            self.needs_redraw = True
+        self.original_bg = colour
+
+    def redraw(self):
+        # This function copies the cell's current text and colour to the
+        # widget, only calling into Tk for the parts that actually changed.
+        # It returns True if the widget was touched.
+        if not self.needs_redraw:
+            return False
+        self.needs_redraw = False
+
+        if len(self.possible_values) == 1:
+            text = str(self.possible_values[0])
+        else:
+            text = ""
+
+        touched = False
+        if text != self.displayed['text']:
+            self.cell_string.set(text)
+            self.displayed['text'] = text
+            touched = True
+
+        options = {}
+        if self.cell_bg != self.displayed['bg']:
+            options['bg'] = self.cell_bg
+        if self.cell_state != self.displayed['state']:
+            options['state'] = self.cell_state
+        if options:
+            self.config(**options)
+            self.displayed.update(options)
+            touched = True
+        return touched
+
 # This class takes a 9x9 2-dimensional array of numbers that represents the
 # starting grid of a Sudoku puzzle. A value of 0 represents an unfilled cell.
-class Sudoku_Grid(tk.Frame):
-    def __init__(self, master=None, seed_values=[], cell_class=Sudoku_Cell):
-        super().__init__(master)
-        self.master = master
+# The optional 'variant' declares the units and killer cages of a Sudoku
+# variant, otherwise the standard rows, columns and 3x3 regions are used.
+# The solver does not need a display, Sudoku_Grid shows it in a window.
+class Sudoku_Solver(object):
+    def __init__(self, seed_values=[], cell_class=Sudoku_Cell_State,
+                 variant=STANDARD_VARIANT):
         self.solved = False
+        self.variant = variant
+        # the results of the last call to solve()
+        self.solutions = []
+        self.tries = 0
+        self.first_solution_tries = None
         self.my_grid=[]
-        self.configure(background="black")
         for row_index in range(9):
             row = []
-            if row_index > 0 and row_index%3 == 0:
-                pady_top = PAD_WIDTH
-            else:
-                pady_top = 0
-            self.rowconfigure(row_index, weight=1)
             for col_index in range(9):
-                self.columnconfigure(col_index, weight=1)
                 if seed_values:
                     cell_value = seed_values[row_index][col_index]
                 else:
                     cell_value = 0
-                cell = cell_class(self, cell_value)
-                if col_index > 0 and col_index%3 == 0:
-                    padx_left = PAD_WIDTH
-                else:
-                    padx_left = 0
-                cell.grid(row=row_index, column=col_index, 
-                          sticky=tk.N+tk.S+tk.E+tk.W,
-                          padx=(padx_left,0), pady=(pady_top,0))
-                row.append(cell)
+                row.append(self.create_cell(cell_class, row_index, col_index, cell_value))
             self.my_grid.append(row)
 
+    def create_cell(self, cell_class, row, column, value):
+        return cell_class(self, value)
+
+    @timed("restore")
     def reset_grid(self, seed_values):
-        # this function will take the output from Sudoku_Grid.get_state() as 
+        # this function will take the output from Sudoku_Solver.get_state() as 
         # the 'seed_values' parameter, and reset the state of the grid 
         for (grid_row, seed_row) in zip(self.my_grid, seed_values):
             for cell, seed_value in zip(grid_row, seed_row):
                 cell.set_state(seed_value)
+        self.redraw()
+
+    @timed("redraw")
+    def redraw(self):
+        # Cells only record their changes while the solver is working on them.
+        # This function pushes those changes out to the widgets in one go, and
+        # returns the number of cells whose text or colour actually changed.
+        redrawn = 0
+        for row in self.my_grid:
+            for cell in row:
+                if cell.redraw():
+                    redrawn += 1
+        return redrawn
+
+    def show_errors(self, cells):
+        # marks the given list of (row, column) cells as clashing
+        for (row, column) in cells:
+            self.my_grid[row][column].set_error()
+        self.redraw()
 
+    @timed("update_grid")
     def update_grid(self):
         # This function returns True if any cells were updated, and false if
         # no cells were updated. This will let us know when we have gone as
@@ -238,18 +430,27 @@ class Sudoku_Grid(tk.Frame):
         # we need to keep track if any cells were updated
         updated = False
 
-        # we loop through each cell on the grid
-        for row in self.my_grid:
-            for cell in row: 
-                # we check the cell if it needs other cells updating
-                if cell.other_cells_need_updating():
-                    self.__update_cells(self.my_grid.index(row),row.index(cell),cell.get_value())
-                    # update the status that a cell was updated
+        try:
+            # we loop through each cell on the grid
+            for row in self.my_grid:
+                for cell in row: 
+                    # we check the cell if it needs other cells updating
+                    if cell.other_cells_need_updating():
+                        self.__update_cells(self.my_grid.index(row),row.index(cell),cell.get_value())
+                        # update the status that a cell was updated
+                        updated = True
+
+            # check through each unit for unique values
+            for unit in self.variant.units:
+                self.__check_unique(unit)
+
+            # remove the values that cannot make up the total of each cage
+            for (cage, combinations) in zip(self.variant.cages, self.variant.cage_combinations):
+                if self.__check_cage(cage, combinations):
                     updated = True
-
-        # check through each row/column/region for unique values
-        for row in range(9):
-            self.__check_unique(row,int((row*12)%9+(row/3)))
+        finally:
+            # show the changes, including any cells marked as clashing
+            self.redraw()
 
         # check if the puzzle has been solved
         self.is_solved()
@@ -259,106 +460,100 @@ class Sudoku_Grid(tk.Frame):
         # has been solved, we return false to break the loop.
         return updated and not self.solved
 
+    @timed("update_cells")
     def __update_cells(self,row,column,value):
-        # This function loops through each cell on a corresponding row, column
-        # and region to remove the value from each cells' possible value list
-
-        # we update the corresponding row and column together in a single loop
-        for i in range(9):
-            if (i != column and self.my_grid[row][i].get_value() == value):
-                self.my_grid[row][column].set_error()
-                self.my_grid[row][i].set_error()
-                raise AttributeError("Invalid cell (%d,%d) value %d"%(row,column,value))
-            if (i != row and self.my_grid[i][column].get_value() == value):
+        # This function loops through each peer of the cell (every other cell
+        # that shares a unit or cage with it) to remove the value from each
+        # cells' possible value list
+        peers = self.variant.peers[row][column]
+
+        # we check for a clash before changing any cell, so that a dead end
+        # leaves the grid untouched
+        for (peer_row, peer_column) in peers:
+            if self.my_grid[peer_row][peer_column].get_value() == value:
                 self.my_grid[row][column].set_error()
-                self.my_grid[i][column].set_error()
-                raise AttributeError("Invalid cell (%d,%d) value: %d"%(row,column,value))
-            self.my_grid[row][i].remove_possible_value(value)
-            self.my_grid[i][column].remove_possible_value(value)
-
-        # to update the region, we'll need to calculate an offset to the
-        # start of the region
-        qr_off = int(row/3)*3
-        qc_off = int(column/3)*3
-
-        # now we'll loop through the 3x3 region
-        for i in range(3):
-            for j in range(3):
-                # here we only update the cells in the correct region
-                if ( (row != (qr_off)+i and column != (qc_off)+j) and 
-                     (self.my_grid[(qr_off)+i][(qc_off)+j].get_value() == value)
-                   ):
-                    self.my_grid[row][column].set_error()
-                    self.my_grid[(qr_off)+i][(qc_off)+j].set_error()
-                    raise AttributeError("Invalid cell (%d,%d) value: %d"%(row,column,value))
-                self.my_grid[(qr_off)+i][(qc_off)+j].remove_possible_value(value)
-
-    def __check_unique(self,row,column):
-        # to update the region, we'll need to calculate an offset to the
-        # start of the region
-        qr_off = int(row/3)*3
-        qc_off = int(column/3)*3
-
-        # after we updated all the cells, we go through them again to see if
-        # each cell has a unique possible value
-        ROW = 0
-        COLUMN = 1
-        REGION = 2
-        possible_values = [[],[],[]]
-        solved_values = [[],[],[]]
-        for i in range(9):
-            cell_value = self.my_grid[row][i].get_value()
+                self.my_grid[peer_row][peer_column].set_error()
+                raise Sudoku_Contradiction("Invalid cell (%d,%d) value: %d"%(row,column,value),
+                                           [(row,column),(peer_row,peer_column)])
+
+        for (peer_row, peer_column) in peers:
+            self.my_grid[peer_row][peer_column].remove_possible_value(value)
+
+    @timed("check_unique")
+    def __check_unique(self,unit):
+        # after we updated all the cells, we go through the cells of a unit
+        # again to see if any value can only go in one of its cells
+        possible_values = []
+        solved_values = []
+        for (row, column) in unit:
+            cell_value = self.my_grid[row][column].get_value()
             if cell_value:
-                solved_values[ROW].append(cell_value)
+                solved_values.append(cell_value)
                 # append an empty list to the possible_values[], as we need the
                 # index to match
-                possible_values[ROW].append([])
+                possible_values.append([])
             else:
-                possible_values[ROW].append(self.my_grid[row][i].get_possible_values())
+                possible_values.append(self.my_grid[row][column].get_possible_values())
+
+        # count how many cells each value could go in
+        counts = {}
+        for values in possible_values:
+            for value in values:
+                counts[value] = counts.get(value, 0) + 1
+
+        # every value has to be either solved or still possible somewhere in
+        # the unit, otherwise we have reached a dead end
+        for value in range(1,10):
+            if value not in solved_values and value not in counts:
+                raise Sudoku_Contradiction("Value %d cannot be placed in cells %s"%(value,unit), unit)
+
+        # set the cells of any unique values
+        for (index, values) in enumerate(possible_values):
+            unique_values = [value for value in values
+                             if counts[value] == 1 and value not in solved_values]
+            if len(unique_values) > 1:
+                # the cell is the only place for more than one value
+                (row, column) = unit[index]
+                self.my_grid[row][column].set_error()
+                raise Sudoku_Contradiction("Invalid cell (%d,%d) values: %s"%(row,column,unique_values),
+                                           [(row,column)])
+            if unique_values:
+                (row, column) = unit[index]
+                self.my_grid[row][column].set_state(unique_values[0])
+
+    @timed("check_cage")
+    def __check_cage(self, cage, combinations):
+        # This function removes the values that cannot help make up the total
+        # of a killer cage. It returns True if any possible values were
+        # removed.
+        (total, cells) = cage
+        cell_values = [self.my_grid[row][column].get_possible_values() for (row, column) in cells]
+
+        # a set of values can fill the cage if every cell can hold one of
+        # them, and every one of them can go in one of the cells
+        allowed = set()
+        for combination in combinations:
+            if all(combination.intersection(values) for values in cell_values):
+                covered = set()
+                for values in cell_values:
+                    covered.update(combination.intersection(values))
+                if covered == combination:
+                    allowed |= combination
+        if not allowed:
+            raise Sudoku_Contradiction("Cage %s cannot add up to %d"%(cells, total), cells)
 
-            cell_value = self.my_grid[i][column].get_value()
-            if cell_value:
-                solved_values[COLUMN].append(cell_value)
-                # append an empty list to the possible_values[], as we need the
-                # index to match
-                possible_values[COLUMN].append([])
+        updated = False
+        for ((row, column), values) in zip(cells, cell_values):
+            if len(values) == 1:
+                if values[0] not in allowed:
+                    self.my_grid[row][column].set_error()
+                    raise Sudoku_Contradiction("Invalid cell (%d,%d) value: %d"%(row,column,values[0]),
+                                               [(row,column)])
             else:
-                possible_values[COLUMN].append(self.my_grid[i][column].get_possible_values())
-
-        for i in range(3):
-            for j in range(3):
-                # here we only update the cells in the correct region
-                cell_value = self.my_grid[(qr_off)+i][(qc_off)+j].get_value()
-                if cell_value:
-                    solved_values[REGION].append(cell_value)
-                    # append an empty list to the possible_values[], as we need
-                    # the index to match
-                    possible_values[REGION].append([])
-                else:
-                    possible_values[REGION].append(self.my_grid[(qr_off)+i][(qc_off)+j].get_possible_values())
-
-        # find the unique values
-        unique_values = [[],[],[]]
-        for i in range(3):
-            all_possible_values = []
-            for values in possible_values[i]:
-                all_possible_values = all_possible_values + values
-            for possible_value in all_possible_values:
-                if all_possible_values.count(possible_value) == 1 and possible_value not in solved_values[i]:
-                    unique_values[i].append(possible_value)
-
-        # check if any unique values exist
-        for i in range(3):
-            for unique_value in unique_values[i]:
-                for values in possible_values[i]:
-                    if unique_value in values:
-                        index = possible_values[i].index(values)
-                        if i == ROW:
-                            self.my_grid[row][index].set_state(unique_value)
-                        elif i == COLUMN:
-                            self.my_grid[index][column].set_state(unique_value)
-                        elif i == REGION:
-                            self.my_grid[(qr_off)+int(index/3)][(qc_off)+(index-(int(index/3)*3))].set_state(unique_value)
+                for value in [value for value in values if value not in allowed]:
+                    self.my_grid[row][column].remove_possible_value(value)
+                    updated = True
+        return updated
 
     def is_solved(self):
         # we set the solved status to True here, and we check below for any 
@@ -373,21 +568,137 @@ class Sudoku_Grid(tk.Frame):
                     self.solved = False
         return self.solved
 
+    def choose_cell(self, order="first", rng=None):
+        # This function picks the next cell to try a value in, and returns its
+        # (row, column), or None if there is no cell to pick. The order can be
+        #   "first"  - a cell with 2 possible values
+        #   "fewest" - a cell with the fewest possible values
+        # Ties are broken by taking the first cell in row order, or a random
+        # cell if 'rng' (a random.Random) is given.
+        fewest = 10
+        cells = []
+        for (row_index, row) in enumerate(self.my_grid):
+            for (col_index, cell) in enumerate(row):
+                count = len(cell.get_possible_values())
+                if count < 2 or (order == "first" and count != 2):
+                    continue
+                if count < fewest:
+                    fewest = count
+                    cells = []
+                if count == fewest:
+                    cells.append((row_index, col_index))
+                    if rng is None and (order == "first" or fewest == 2):
+                        # no other cell can beat this one
+                        return cells[0]
+        if not cells:
+            return None
+        if rng is None:
+            return cells[0]
+        return rng.choice(cells)
+
+    @timed("try_next")
     def try_next(self, try_number=0):
         # This function searches for a cell with 2 possible values, and sets
         # the cell value to one of the two possible values. The parameter
         # try_number determines which of the two possible values is used.
         # It returns True if it successfully sets a cell, or returns False if
         # it did not manage to set a cell.
-        for row in self.my_grid:
-            for cell in row:
-                possible_values = cell.get_possible_values()
-                if len(possible_values) == 2:
-                    cell.set_state(possible_values[try_number])
-                    logging.info("Trying cell (%d,%d) value %d from %s"%
-                        (self.my_grid.index(row),row.index(cell),possible_values[try_number],possible_values))
-                    return True
-        return False
+        next_cell = self.choose_cell("first")
+        if next_cell is None:
+            return False
+        (row, column) = next_cell
+        cell = self.my_grid[row][column]
+        possible_values = cell.get_possible_values()
+        cell.set_state(possible_values[try_number])
+        cell.redraw()
+        logging.info("Trying cell (%d,%d) value %d from %s"%
+            (row,column,possible_values[try_number],possible_values))
+        return True
+
+    def solve(self, order="first", rng=None, max_tries=None, max_solutions=1):
+        # This function works through the puzzle without any user input. It
+        # does what the 'Go', 'Try' and 'Revert' buttons do: it updates the
+        # grid as far as it can, then tries each possible value of the cell
+        # picked by choose_cell(), going back to the saved grid whenever a
+        # value leads to a dead end. If 'rng' is given, the values of a cell
+        # are tried in a random order. It returns True if the puzzle was
+        # solved, False if it cannot be solved, or None if it gave up after
+        # 'max_tries' tries.
+        # The search carries on until it has found 'max_solutions' solutions,
+        # which are kept in self.solutions, so max_solutions=2 checks that a
+        # puzzle has only one solution. The grid is left holding the first.
+        validate_puzzle(self.get_state(), self.variant)
+        grid_stack = []
+        self.solutions = []
+        self.tries = 0
+        self.first_solution_tries = None
+        while True:
+            try:
+                while self.update_grid():
+                    pass
+                if self.is_solved():
+                    # make sure the last cells to be filled in do not clash
+                    validate_puzzle(self.get_state(), self.variant)
+                    self.solutions.append(self.get_solution())
+                    if len(self.solutions) == 1:
+                        self.first_solution_tries = self.tries
+                    if len(self.solutions) >= max_solutions:
+                        self.reset_grid(self.solutions[0])
+                        return True
+                    # go back and look for another solution
+                    raise Sudoku_Contradiction("Looking for another solution")
+                next_cell = self.choose_cell(order, rng) or self.choose_cell("fewest", rng)
+                (row, column) = next_cell
+                values = list(self.my_grid[row][column].get_possible_values())
+                if rng is not None:
+                    rng.shuffle(values)
+                with sudoku_profile.phase("snapshot"):
+                    grid_stack.append({'grid':copy.deepcopy(self.get_state()), 'cell':next_cell,
+                                       'values':values, 'try_number':0})
+            except Sudoku_Contradiction:
+                # we pop the grids that we have already tried every value of,
+                # off the stack
+                while grid_stack and grid_stack[-1]['try_number'] == len(grid_stack[-1]['values'])-1:
+                    grid_stack.pop()
+                if not grid_stack:
+                    if self.solutions:
+                        self.reset_grid(self.solutions[0])
+                        return True
+                    return False
+                grid_stack[-1]['try_number'] += 1
+                # the grid on the stack may be needed again, so we reset the
+                # grid from a copy of it
+                self.reset_grid(copy.deepcopy(grid_stack[-1]['grid']))
+
+            self.tries += 1
+            if max_tries is not None and self.tries > max_tries:
+                return None
+            self.__try_value(grid_stack[-1])
+
+    @timed("try_next")
+    def __try_value(self, entry):
+        (row, column) = entry['cell']
+        value = entry['values'][entry['try_number']]
+        self.my_grid[row][column].set_state(value)
+        logging.debug("Trying cell (%d,%d) value %d from %s"%(row,column,value,entry['values']))
+
+    def get_difficulty(self):
+        # rates the puzzle after solve() by how many values had to be tried
+        # before the first solution was found, or returns None if it has not
+        # been solved
+        if self.first_solution_tries is None:
+            return None
+        elif self.first_solution_tries == 0:
+            return "easy"
+        elif self.first_solution_tries <= DIFFICULTY_HARD_TRIES:
+            return "hard"
+        else:
+            return "expert"
+
+    def get_solution(self):
+        # returns the values of the grid as a 9x9 array of numbers, with 0 for
+        # any unfilled cell
+        return [[cell.get_value() for cell in row] for row in self.my_grid]
 
     def get_state(self):
         # get_state returns the current state of the grid as a list of possible
@@ -416,8 +727,53 @@ class Sudoku_Grid(tk.Frame):
                 string += "\n\r"
         return string
 
+# This class shows a Sudoku_Solver in a window, with a Sudoku_Cell widget for
+# each cell of the grid
+class Sudoku_Grid(Sudoku_Solver, tk.Frame):
+    def __init__(self, master=None, seed_values=[], cell_class=Sudoku_Cell,
+                 variant=STANDARD_VARIANT):
+        tk.Frame.__init__(self, master)
+        self.master = master
+        self.configure(background="black")
+        for index in range(9):
+            self.rowconfigure(index, weight=1)
+            self.columnconfigure(index, weight=1)
+        Sudoku_Solver.__init__(self, seed_values, cell_class, variant)
+
+        # pick out the cells of the extra units and the killer cages
+        extra_cells = set()
+        for unit in variant.units[27:]:
+            extra_cells.update(unit)
+        for (row_index, col_index) in extra_cells:
+            self.my_grid[row_index][col_index].set_background(EXTRA_UNIT_COLOUR)
+        for (index, (total, cells)) in enumerate(variant.cages):
+            for (row_index, col_index) in cells:
+                self.my_grid[row_index][col_index].set_background(CAGE_COLOURS[index%len(CAGE_COLOURS)])
+                self.my_grid[row_index][col_index].cage_total = total
+        self.redraw()
+
+    def create_cell(self, cell_class, row, column, value):
+        cell = cell_class(self, value)
+        # draw a thicker line between cells in different regions
+        regions = self.variant.regions
+        if row > 0 and regions[row][column] != regions[row-1][column]:
+            pady_top = PAD_WIDTH
+        else:
+            pady_top = 0
+        if column > 0 and regions[row][column] != regions[row][column-1]:
+            padx_left = PAD_WIDTH
+        else:
+            padx_left = 0
+        cell.grid(row=row, column=column, 
+                  sticky=tk.N+tk.S+tk.E+tk.W,
+                  padx=(padx_left,0), pady=(pady_top,0))
+        return cell
+
 def go_btn_callback():
     try:
+        # check the grid before we start changing it, so that a puzzle that
+        # cannot be solved is rejected straight away
+        validate_puzzle(my_grid.get_state(), my_grid.variant)
         if not my_grid.update_grid():
             # once the puzzle has been solved, or if it is unsolvable, hide the 
             # 'Go' button
@@ -428,8 +784,9 @@ def go_btn_callback():
             else:
                 # show the 'Clear' button because the puzzle is unsolvable
                 clear_btn.grid()
-    except AttributeError as e:
-        # An AttributeError here means that a cell value clash has occurred.
+    except Sudoku_Contradiction as e:
+        # A Sudoku_Contradiction here means that a cell value clash has
+        # occurred, or that the grid can no longer be solved.
         # Hide the 'Go' button
         go_btn.grid_remove()
 
@@ -439,7 +796,12 @@ def go_btn_callback():
             # Show the 'Revert' button to allow the user to revert to a prior
             # grid state
             revert_btn.grid()
-        # we log the clash cell coordinate and the value
+        else:
+            # show the 'Clear' button because the puzzle is unsolvable
+            clear_btn.grid()
+        # we mark the cells involved, and log the clash cell coordinate and
+        # the value
+        my_grid.show_errors(e.cells)
         logging.error(str(e))
 
     # if logging level set to debug, it will print each cell and the list
@@ -450,7 +812,8 @@ def go_btn_callback():
 
 def try_btn_callback():
     # first we make a copy of the grid as it is and push it onto the stack
-    grid_stack.append({'grid':copy.deepcopy(my_grid.get_state()), 'try_number':0})
+    with sudoku_profile.phase("snapshot"):
+        grid_stack.append({'grid':copy.deepcopy(my_grid.get_state()), 'try_number':0})
     # next we tell the grid to try the first possibility of a cell with only
     # two possibilities
     result = my_grid.try_next(0)
@@ -492,6 +855,9 @@ def clear_btn_callback():
     # clear the grid stack
     grid_stack = []
 
+    # count any further solver timings against the new puzzle
+    sudoku_profile.start_puzzle("empty")
+
     # reset the grid to empty
     my_grid.reset_grid(puzzle['empty'])
 
@@ -501,16 +867,152 @@ def clear_btn_callback():
     # add the 'Go' button to the control button column
     go_btn.grid()
 
+def solve_batch(batch_filename, store_filename=None):
+    # This function solves each puzzle in the file 'batch_filename' ('-' for
+    # standard input), one 81 digit puzzle per line with 0 or . for an
+    # unfilled cell, and prints each puzzle followed by its solution. If a
+    # 'store_filename' is given, the puzzles already in that Sudoku_Store are
+    # not solved again, and the results of the others are added to it.
+    import sudoku_store
+
+    if batch_filename == "-":
+        batch_file = sys.stdin
+    else:
+        batch_file = open(batch_filename)
+    if store_filename:
+        store = sudoku_store.Sudoku_Store(store_filename)
+    else:
+        store = None
+
+    counts = {'solved':0, 'stored':0, 'unsolvable':0, 'invalid':0}
+    try:
+        while True:
+            # read the puzzles in chunks, so that each chunk can be looked up
+            # in and added to the store in one go
+            lines = list(itertools.islice(batch_file, BATCH_CHUNK_SIZE))
+            if not lines:
+                break
+            puzzles = []
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    puzzles.append(sudoku_store.puzzle_to_string(sudoku_store.string_to_puzzle(line)))
+                except ValueError as e:
+                    logging.error(str(e))
+
+            if store is not None:
+                stored = store.get_many(puzzles)
+            else:
+                stored = {}
+            # the results of this chunk, which also saves solving a puzzle
+            # twice if it is repeated in the chunk
+            results = dict(stored)
+            new_results = []
+            for puzzle_string in puzzles:
+                if puzzle_string in stored:
+                    counts['stored'] += 1
+                else:
+                    if puzzle_string not in results:
+                        sudoku_profile.start_puzzle(puzzle_string)
+                        seed_values = sudoku_store.string_to_puzzle(puzzle_string)
+                        solver = Sudoku_Solver(seed_values)
+                        start = time.perf_counter()
+                        try:
+                            # look for a second solution, to tell whether the
+                            # puzzle has only one
+                            with sudoku_profile.phase("solve"):
+                                solver.solve(max_solutions=2)
+                        except Sudoku_Invalid_Puzzle as e:
+                            # invalid puzzles are not kept in the store
+                            logging.error("%s: %s"%(puzzle_string, e))
+                            counts['invalid'] += 1
+                            print(puzzle_string, "-")
+                            continue
+                        result = sudoku_store.make_result(seed_values, solver, time.perf_counter()-start)
+                        results[puzzle_string] = result
+                        new_results.append(result)
+                    counts['solved'] += 1
+                if results[puzzle_string]['solution'] is None:
+                    counts['unsolvable'] += 1
+                print(puzzle_string, results[puzzle_string]['solution'] or "-")
+
+            if store is not None and new_results:
+                store.put_many(new_results)
+    finally:
+        if store is not None:
+            store.close()
+        if batch_file is not sys.stdin:
+            batch_file.close()
+
+    logging.info("Solved %d puzzles, found %d in the store, %d cannot be solved, %d are invalid"%
+                 (counts['solved'], counts['stored'], counts['unsolvable'], counts['invalid']))
+
+def write_profile(args, profiler):
+    # print out where the solver spent its time, and write out the files
+    # asked for on the command line
+    logging.info(profiler.report())
+    if args.profile_puzzle and not profiler.puzzle_stacks:
+        logging.warning("Puzzle %s was not solved, as it is not in the batch or is "
+                        "already in the store"%args.profile_puzzle)
+    if args.profile_output:
+        profiler.dump_stats(args.profile_output)
+    if args.collapsed_output:
+        profiler.dump_collapsed(args.collapsed_output)
+
 def parseOptions():
     parser = argparse.ArgumentParser(description="A simple Sudoku puzzle solver")
 
     parser.add_argument("-p", "--puzzle_level", 
         help="Selects the difficulty level of the puzzle",
-        choices=puzzle.keys(),
+        choices=list(puzzle.keys()) + list(variant_puzzle.keys()),
         action="store", required=False, default="empty")
 
+    parser.add_argument("-b", "--batch", metavar="FILE",
+        help="Solves each puzzle in FILE ('-' for standard input) without "
+             "opening a window, and prints its solution. FILE has one 81 digit "
+             "puzzle per line, with 0 or . for an unfilled cell",
+        action="store", required=False, default=None)
+
+    parser.add_argument("--store", metavar="FILE",
+        help="Keeps the results of --batch in the SQLite database FILE, and "
+             "skips the puzzles that are already in it. Requires --batch",
+        action="store", required=False, default=None)
+
+    parser.add_argument("--profile",
+        help="Times each phase of the solver and prints a summary on exit",
+        action="store_true", required=False, default=False)
+
+    parser.add_argument("--profile-output", metavar="FILE",
+        help="Writes cProfile statistics to FILE (implies --profile)",
+        action="store", required=False, default=None)
+
+    parser.add_argument("--collapsed-output", metavar="FILE",
+        help="Writes collapsed stacks of the solver phases to FILE, for use "
+             "with flamegraph.pl (implies --profile)",
+        action="store", required=False, default=None)
+
+    parser.add_argument("--profile-puzzle", metavar="PUZZLE",
+        help="Only runs cProfile, and only writes collapsed stacks, for the "
+             "81 digit PUZZLE of the --batch file (implies --profile)",
+        action="store", required=False, default=None)
+
     args = parser.parse_args()
 
+    if args.store and not args.batch:
+        parser.error("--store can only be used with --batch")
+
+    if args.profile_puzzle:
+        if not args.batch:
+            parser.error("--profile-puzzle can only be used with --batch")
+        # the puzzles of a batch are named by their 81 digit string
+        import sudoku_store
+        try:
+            args.profile_puzzle = sudoku_store.puzzle_to_string(
+                sudoku_store.string_to_puzzle(args.profile_puzzle))
+        except ValueError as e:
+            parser.error(str(e))
+
     return args
 
 if __name__ == "__main__":
@@ -520,6 +1022,32 @@ if __name__ == "__main__":
     # get the chosen puzzle difficulty level
     args = parseOptions()
 
+    # profiling is only switched on if it was asked for on the command line
+    profile = args.profile or args.profile_output or args.collapsed_output or args.profile_puzzle
+    if profile:
+        profiler = sudoku_profile.Profiler(use_cprofile=bool(args.profile_output),
+                                           puzzle=args.profile_puzzle)
+        profile_context = sudoku_profile.profiling(profiler=profiler)
+    else:
+        profile_context = contextlib.nullcontext()
+
+    if args.batch:
+        # solve a file of puzzles without opening a window
+        with profile_context as profiler:
+            solve_batch(args.batch, args.store)
+        if profile:
+            write_profile(args, profiler)
+        raise SystemExit
+
+    # work out the seed values, and the constraints if the puzzle is one of
+    # the Sudoku variants
+    if args.puzzle_level in variant_puzzle:
+        seed_values = variant_puzzle[args.puzzle_level]['grid']
+        variant = Sudoku_Variant(**variant_puzzle[args.puzzle_level]['variant'])
+    else:
+        seed_values = puzzle[args.puzzle_level]
+        variant = STANDARD_VARIANT
+
     # instantiate the tkinter root, and set the title and geometry
     root = tk.Tk()
     root.title('Sudoku')
@@ -540,7 +1068,7 @@ if __name__ == "__main__":
     control_font = tkFont.Font(family='Helvetica',size=18, weight='bold')
 
     # instantiate a Sudoku grid with seed values
-    my_grid = Sudoku_Grid(root, puzzle[args.puzzle_level])
+    my_grid = Sudoku_Grid(root, seed_values, variant=variant)
 
     # add the Sudoku grid to root grid at row 0, column 0
     my_grid.grid(row=0, column=0, sticky=tk.N+tk.S+tk.E+tk.W, rowspan=9)
@@ -590,13 +1118,31 @@ if __name__ == "__main__":
     revert_btn.grid_remove()
     clear_btn.grid_remove()
 
-    root.mainloop()
+    # check the chosen puzzle before we start, and only offer to clear the
+    # grid if it cannot be solved
+    try:
+        validate_puzzle(seed_values, variant)
+    except Sudoku_Invalid_Puzzle as e:
+        my_grid.show_errors(e.cells)
+        logging.error(str(e))
+        go_btn.grid_remove()
+        clear_btn.grid()
 
-    # after we exit the loop above, we check if the puzzle has been solved
-    my_grid.update_grid()
-    if not my_grid.is_solved():
-        logging.info("Puzzle not solved")
-    else:
-        logging.info("Puzzle solved!")
+    with profile_context as profiler:
+        sudoku_profile.start_puzzle(args.puzzle_level)
+        root.mainloop()
+
+        # after we exit the loop above, we check if the puzzle has been solved
+        try:
+            my_grid.update_grid()
+        except Sudoku_Contradiction as e:
+            logging.error(str(e))
+        if not my_grid.is_solved():
+            logging.info("Puzzle not solved")
+        else:
+            logging.info("Puzzle solved!")
+
+    if profile:
+        write_profile(args, profiler)
 
     root.destroy()
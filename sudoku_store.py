@@ -0,0 +1,95 @@
+import sqlite3, time
+
+# the number of puzzles looked up in a single query, which keeps us below the
+# SQLite limit on the number of query parameters
+LOOKUP_CHUNK_SIZE = 500
+
+# the fields kept for each puzzle, in the order of the table columns
+RESULT_FIELDS = ['puzzle', 'solution', 'solution_count', 'difficulty', 'tries',
+                 'solve_time', 'solved_at']
+
+def puzzle_to_string(seed_values):
+    # turns a 9x9 array of numbers into the 81 digit string used as the key
+    # of the store, with 0 for an unfilled cell
+    return "".join(str(value) for row in seed_values for value in row)
+
+def string_to_puzzle(string):
+    # turns an 81 character puzzle string back into a 9x9 array of numbers.
+    # Unfilled cells can be given as '0' or '.'
+    string = string.strip().replace(".", "0")
+    if len(string) != 81 or not string.isdigit():
+        raise ValueError("Puzzle is not an 81 digit string: %s"%string)
+    return [[int(value) for value in string[row*9:(row+1)*9]] for row in range(9)]
+
+# This class keeps the results of solved puzzles in an SQLite database file,
+# keyed by the 81 digit puzzle string, so that a puzzle only has to be solved
+# once. Each result is a dictionary with the RESULT_FIELDS:
+#   puzzle         - the 81 digit puzzle string
+#   solution       - the 81 digit solution string, or None if it has none
+#   solution_count - the number of solutions found, up to 2
+#   difficulty     - "easy", "hard" or "expert"
+#   tries          - how many values were tried before it was solved
+#   solve_time     - how long it took to solve, in seconds
+#   solved_at      - when it was solved, as a time.time() timestamp
+class Sudoku_Store(object):
+    def __init__(self, filename):
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results ("
+                                "puzzle TEXT PRIMARY KEY, solution TEXT, "
+                                "solution_count INTEGER, difficulty TEXT, "
+                                "tries INTEGER, solve_time REAL, solved_at REAL)")
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def get(self, puzzle):
+        # returns the result for a single puzzle string, or None
+        return self.get_many([puzzle]).get(puzzle)
+
+    def get_many(self, puzzles):
+        # returns a dictionary of puzzle string -> result, for each of the
+        # puzzles that are in the store
+        puzzles = list(puzzles)
+        results = {}
+        for start in range(0, len(puzzles), LOOKUP_CHUNK_SIZE):
+            chunk = puzzles[start:start+LOOKUP_CHUNK_SIZE]
+            rows = self.connection.execute(
+                "SELECT %s FROM results WHERE puzzle IN (%s)"%
+                (", ".join(RESULT_FIELDS), ", ".join("?"*len(chunk))), chunk)
+            for row in rows:
+                results[row[0]] = dict(zip(RESULT_FIELDS, row))
+        return results
+
+    def put(self, result):
+        self.put_many([result])
+
+    def put_many(self, results):
+        # adds the results to the store in a single transaction, replacing any
+        # earlier results for the same puzzles
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO results (%s) VALUES (%s)"%
+                (", ".join(RESULT_FIELDS), ", ".join("?"*len(RESULT_FIELDS))),
+                [[result.get(field) for field in RESULT_FIELDS] for result in results])
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+def make_result(seed_values, solver, solve_time):
+    # builds the result to store for a puzzle, from a Sudoku_Solver that has
+    # run solve() with max_solutions=2
+    if solver.solutions:
+        solution = puzzle_to_string(solver.solutions[0])
+    else:
+        solution = None
+    return {'puzzle':puzzle_to_string(seed_values), 'solution':solution,
+            'solution_count':len(solver.solutions), 'difficulty':solver.get_difficulty(),
+            'tries':solver.first_solution_tries, 'solve_time':solve_time,
+            'solved_at':time.time()}
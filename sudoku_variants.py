@@ -0,0 +1,72 @@
+import itertools
+
+# the standard 3x3 regions of the grid, as a 9x9 array of region numbers
+STANDARD_REGIONS = [[(row//3)*3 + column//3 for column in range(9)] for row in range(9)]
+
+# the four extra 3x3 windows of a Windoku puzzle
+WINDOW_OFFSETS = [(1,1), (1,5), (5,1), (5,5)]
+
+# This class declares the constraints of a Sudoku puzzle. A unit is a list of
+# 9 (row, column) cells that must hold each of the values 1 to 9 exactly once.
+# Every puzzle has the 9 rows and 9 columns as units, and the regions can be
+# replaced with jigsaw shaped ones. On top of these, a variant can add:
+#   diagonals - the two main diagonals as units (X-Sudoku)
+#   windows   - the four extra 3x3 windows as units (Windoku)
+#   cages     - a list of (total, [(row, column), ...]) killer cages, whose
+#               cells hold different values that add up to the total
+# The peers of each cell (every other cell that cannot hold the same value)
+# are worked out once here, so the solver only has to look them up.
+class Sudoku_Variant(object):
+    def __init__(self, regions=None, diagonals=False, windows=False, cages=[]):
+        if regions is None:
+            regions = STANDARD_REGIONS
+        self.regions = regions
+        self.diagonals = diagonals
+        self.windows = windows
+        self.cages = [(total, [tuple(cell) for cell in cells]) for (total, cells) in cages]
+
+        # the rows and columns
+        self.units = ([[(row, column) for column in range(9)] for row in range(9)] +
+                      [[(row, column) for row in range(9)] for column in range(9)])
+
+        # the regions, which may be jigsaw shaped
+        region_cells = {}
+        for row in range(9):
+            for column in range(9):
+                region_cells.setdefault(regions[row][column], []).append((row, column))
+        if len(region_cells) != 9 or any(len(cells) != 9 for cells in region_cells.values()):
+            raise ValueError("Regions must split the grid into 9 regions of 9 cells")
+        self.units += [region_cells[region] for region in sorted(region_cells)]
+
+        if diagonals:
+            self.units.append([(i, i) for i in range(9)])
+            self.units.append([(i, 8-i) for i in range(9)])
+
+        if windows:
+            for (row_offset, column_offset) in WINDOW_OFFSETS:
+                self.units.append([(row_offset+i, column_offset+j) for i in range(3) for j in range(3)])
+
+        # check the cages, and work out the sets of values that could fill
+        # each one
+        self.cage_combinations = []
+        caged = set()
+        for (total, cells) in self.cages:
+            if not cells or len(cells) > 9 or caged.intersection(cells):
+                raise ValueError("Invalid cage %s"%cells)
+            caged.update(cells)
+            combinations = [set(values) for values in itertools.combinations(range(1,10), len(cells))
+                            if sum(values) == total]
+            if not combinations:
+                raise ValueError("Cage %s cannot add up to %d"%(cells, total))
+            self.cage_combinations.append(combinations)
+
+        # work out the peers of each cell
+        peers = [[set() for column in range(9)] for row in range(9)]
+        for cells in self.units + [cells for (total, cells) in self.cages]:
+            for (row, column) in cells:
+                peers[row][column].update(cells)
+        self.peers = [[sorted(peers[row][column] - {(row, column)}) for column in range(9)]
+                      for row in range(9)]
+
+# the constraints of a standard Sudoku puzzle
+STANDARD_VARIANT = Sudoku_Variant()